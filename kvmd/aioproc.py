@@ -42,7 +42,7 @@ async def run_process(
         *cmd,
         stdout=asyncio.subprocess.PIPE,
         stderr=(asyncio.subprocess.DEVNULL if err_to_null else asyncio.subprocess.STDOUT),
-        preexec_fn=os.setpgrp,
+        process_group=0,  # Unlike preexec_fn=os.setpgrp, allows vfork() instead of fork()
         env=env,
     ))
 
@@ -92,7 +92,10 @@ async def kill_process(proc: asyncio.subprocess.Process, wait: float, logger: lo
     if proc.returncode is None:
         try:
             proc.terminate()
-            await asyncio.sleep(wait)
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
             if proc.returncode is None:
                 try:
                     os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
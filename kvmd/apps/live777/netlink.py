@@ -0,0 +1,97 @@
+# ========================================================================== #
+#                                                                            #
+#    KVMD - The main PiKVM daemon.                                           #
+#                                                                            #
+#    Copyright (C) 2018-2024  Maxim Devaev <mdevaev@gmail.com>               #
+#                                                                            #
+#    This program is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by    #
+#    the Free Software Foundation, either version 3 of the License, or       #
+#    (at your option) any later version.                                     #
+#                                                                            #
+#    This program is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#    GNU General Public License for more details.                            #
+#                                                                            #
+#    You should have received a copy of the GNU General Public License       #
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                            #
+# ========================================================================== #
+
+
+import asyncio
+import socket
+import types
+
+from typing import Callable
+
+from ...logging import get_logger
+
+
+# =====
+_RTMGRP_LINK = 0x0001
+_RTMGRP_IPV4_IFADDR = 0x0010
+_RTMGRP_IPV4_ROUTE = 0x0040
+_RTMGRP_IPV6_IFADDR = 0x0100
+_RTMGRP_IPV6_ROUTE = 0x0400
+
+_RTMGRP_ALL_CHANGES = (
+    _RTMGRP_LINK
+    | _RTMGRP_IPV4_IFADDR
+    | _RTMGRP_IPV4_ROUTE
+    | _RTMGRP_IPV6_IFADDR
+    | _RTMGRP_IPV6_ROUTE
+)
+
+
+# =====
+class NetlinkWatcher:
+    def __init__(self, on_change: Callable[[], None]) -> None:
+        self.__on_change = on_change
+        self.__sock: (socket.socket | None) = None
+
+    def __read_and_notify(self) -> None:
+        assert self.__sock is not None
+        changed = False
+        while True:
+            try:
+                if not self.__sock.recv(65536):
+                    break
+                changed = True
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as ex:
+                # ENOBUFS: The kernel dropped some messages, but something has changed anyway
+                get_logger(0).error("Netlink socket error: %s", ex)
+                changed = True
+                break
+        if changed:
+            self.__on_change()
+
+    def __enter__(self) -> "NetlinkWatcher":
+        assert self.__sock is None
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK, socket.NETLINK_ROUTE)
+        try:
+            sock.bind((0, _RTMGRP_ALL_CHANGES))
+            asyncio.get_running_loop().add_reader(sock.fileno(), self.__read_and_notify)
+        except Exception:
+            sock.close()
+            raise
+        self.__sock = sock
+        return self
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException],
+        _exc: BaseException,
+        _tb: types.TracebackType,
+    ) -> None:
+
+        if self.__sock is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self.__sock.fileno())
+            except Exception:
+                pass
+            self.__sock.close()
+            self.__sock = None
@@ -23,6 +23,7 @@
 import asyncio
 import asyncio.subprocess
 import socket
+import time
 import dataclasses
 
 import netifaces
@@ -35,6 +36,7 @@ from ...logging import get_logger
 
 from .stun import StunNatType
 from .stun import Stun
+from .netlink import NetlinkWatcher
 
 
 # =====
@@ -48,8 +50,11 @@ class _Netcfg:
     stun_port: int = dataclasses.field(default=0)
 
 
+_NETCFG_FIELDS = dataclasses.fields(_Netcfg)
+
+
 # =====
-class Live777Runner:
+class Live777Runner:  # pylint: disable=too-many-instance-attributes
     def __init__(  # pylint: disable=too-many-arguments
         self,
         stun_host: str,
@@ -59,6 +64,7 @@ class Live777Runner:
         stun_retries_delay: float,
 
         check_interval: int,
+        check_max_interval: float,
         check_retries: int,
         check_retries_delay: float,
 
@@ -70,14 +76,22 @@ class Live777Runner:
         self.__stun = Stun(stun_host, stun_port, stun_timeout, stun_retries, stun_retries_delay)
 
         self.__check_interval = check_interval
+        self.__check_max_interval = check_max_interval
         self.__check_retries = check_retries
         self.__check_retries_delay = check_retries_delay
 
         self.__cmd = tools.build_cmd(cmd, cmd_remove, cmd_append)
 
         self.__live777_task: (asyncio.Task | None) = None
+        self.__live777_stop_event = asyncio.Event()
         self.__live777_proc: (asyncio.subprocess.Process | None) = None
 
+        self.__net_notifier = aiotools.AioNotifier()
+        self.__net_flush_handle: (asyncio.TimerHandle | None) = None
+
+        self.__default_ip = ""
+        self.__default_ip_ts = 0.0
+
     def run(self) -> None:
         logger = get_logger(0)
         logger.info("Starting Live777 Runner ...")
@@ -87,6 +101,16 @@ class Live777Runner:
     # =====
 
     async def __run(self) -> None:
+        try:
+            with NetlinkWatcher(self.__on_network_changed):
+                await self.__probing_loop()
+        finally:
+            if self.__net_flush_handle is not None:
+                self.__net_flush_handle.cancel()
+                self.__net_flush_handle = None
+            self.__stun.close()
+
+    async def __probing_loop(self) -> None:
         logger = get_logger(0)
         logger.info("Probing the network first time ...")
 
@@ -112,14 +136,45 @@ class Live777Runner:
                     await self.__stop_live777()
                 prev_netcfg = netcfg
 
-            await asyncio.sleep(self.__check_interval)
+            # Without the external IP we can't rely on the local network events only
+            timeout = (self.__check_max_interval if netcfg.ext_ip else self.__check_interval)
+            if (await self.__net_notifier.wait(timeout)) >= 0:
+                logger.info("Network has been changed, probing it again ...")
+
+    def __on_network_changed(self) -> None:
+        self.__default_ip_ts = 0.0
+        self.__stun.invalidate()
+        # Coalesce the bursts of events (VPN, docker veths, etc) into a single probe
+        if self.__net_flush_handle is None:
+            self.__net_flush_handle = asyncio.get_running_loop().call_later(0.2, self.__flush_network_changes)
+
+    def __flush_network_changes(self) -> None:
+        self.__net_flush_handle = None
+        self.__net_notifier.notify()
 
     async def __get_netcfg(self) -> _Netcfg:
         src_ip = (self.__get_default_ip() or "0.0.0.0")
         info = await self.__stun.get_info(src_ip, 0)
-        return _Netcfg(**dataclasses.asdict(info))
+        return _Netcfg(
+            nat_type=info.nat_type,
+            src_ip=info.src_ip,
+            ext_ip=info.ext_ip,
+            stun_host=info.stun_host,
+            stun_ip=info.stun_ip,
+            stun_port=info.stun_port,
+        )
 
     def __get_default_ip(self) -> str:
+        now = time.monotonic()
+        # Netlink drops the cache on changes, so it's enough to outlive the whole retries series
+        ttl = self.__check_retries_delay * self.__check_retries
+        if self.__default_ip_ts > 0 and now - self.__default_ip_ts < ttl:
+            return self.__default_ip
+        self.__default_ip = self.__inner_get_default_ip()
+        self.__default_ip_ts = (now if self.__default_ip else 0.0)
+        return self.__default_ip
+
+    def __inner_get_default_ip(self) -> str:
         try:
             gws = netifaces.gateways()
             if "default" in gws:
@@ -145,14 +200,15 @@ class Live777Runner:
     async def __start_live777(self, netcfg: _Netcfg) -> None:
         get_logger(0).info("Starting Live777 ...")
         assert not self.__live777_task
+        self.__live777_stop_event.clear()
         self.__live777_task = asyncio.create_task(self.__live777_task_loop(netcfg))
 
     @aiotools.atomic_fg
     async def __stop_live777(self) -> None:
         if self.__live777_task:
             get_logger(0).info("Stopping Live777 ...")
-            self.__live777_task.cancel()
-            await asyncio.gather(self.__live777_task, return_exceptions=True)
+            self.__live777_stop_event.set()
+            await self.__live777_task
         await self.__kill_live777_proc()
         self.__live777_task = None
 
@@ -160,40 +216,53 @@ class Live777Runner:
 
     async def __live777_task_loop(self, netcfg: _Netcfg) -> None:
         logger = get_logger(0)
-        while True:
-            try:
-                await self.__start_live777_proc(netcfg)
-                assert self.__live777_proc is not None
-                await aioproc.log_stdout_infinite(self.__live777_proc, logger)
-                raise RuntimeError("Live777 unexpectedly died")
-            except asyncio.CancelledError:
-                break
-            except Exception:
-                if self.__live777_proc:
-                    logger.exception("Unexpected Live777 error: pid=%d", self.__live777_proc.pid)
-                else:
-                    logger.exception("Can't start Live777")
-                await self.__kill_live777_proc()
-                await asyncio.sleep(1)
+        stop_task = asyncio.create_task(self.__live777_stop_event.wait())
+        try:
+            while not stop_task.done():
+                try:
+                    await self.__start_live777_proc(netcfg)
+                    assert self.__live777_proc is not None
+                    log_task = asyncio.create_task(aioproc.log_stdout_infinite(self.__live777_proc, logger))
+                    try:
+                        await aiotools.wait_first(stop_task, log_task)
+                    finally:
+                        log_task.cancel()
+                        await asyncio.gather(log_task, return_exceptions=True)
+                    if stop_task.done():
+                        break
+                    log_task.result()
+                    raise RuntimeError("Live777 unexpectedly died")
+                except Exception:
+                    if self.__live777_proc:
+                        logger.exception("Unexpected Live777 error: pid=%d", self.__live777_proc.pid)
+                    else:
+                        logger.exception("Can't start Live777")
+                    await self.__kill_live777_proc()
+                    await asyncio.wait([stop_task], timeout=1)
+        finally:
+            stop_task.cancel()
 
     async def __start_live777_proc(self, netcfg: _Netcfg) -> None:
         assert self.__live777_proc is None
         placeholders = {
             "o_stun_server": f"--stun-server={netcfg.stun_ip}:{netcfg.stun_port}",
             **{
-                key: str(value)
-                for (key, value) in dataclasses.asdict(netcfg).items()
+                field.name: str(getattr(netcfg, field.name))
+                for field in _NETCFG_FIELDS
             },
         }
-        cmd = list(self.__cmd)
-        if not netcfg.ext_ip:
+        if netcfg.ext_ip:
+            cmd = [
+                part.format(**placeholders)
+                for part in self.__cmd
+            ]
+        else:
             placeholders["o_stun_server"] = ""
-            while "{o_stun_server}" in cmd:
-                cmd.remove("{o_stun_server}")
-        cmd = [
-            part.format(**placeholders)
-            for part in cmd
-        ]
+            cmd = [
+                part.format(**placeholders)
+                for part in self.__cmd
+                if part != "{o_stun_server}"
+            ]
         self.__live777_proc = await aioproc.run_process(
             cmd=cmd,
             env={
@@ -22,7 +22,7 @@
 
 import asyncio
 import socket
-import ipaddress
+import time
 import struct
 import secrets
 import dataclasses
@@ -34,6 +34,21 @@ from ... import aiotools
 from ...logging import get_logger
 
 
+# =====
+_HEADER = struct.Struct(">HH")  # Type, length; the magic cookie is a part of the trans_id
+_ATTR_HEADER = struct.Struct(">HH")  # Type, length
+_PORT = struct.Struct(">H")
+
+_ATTR_FIELDS = {
+    0x0001: "ext",      # MAPPED-ADDRESS
+    0x0020: "ext",      # XOR-MAPPED-ADDRESS
+    0x0004: "src",      # SOURCE-ADDRESS
+    0x0005: "changed",  # CHANGED-ADDRESS
+}
+
+_MAX_RETRIES_DELAY = 30.0
+
+
 # =====
 class StunNatType(enum.Enum):
     ERROR               = ""
@@ -71,6 +86,78 @@ class _StunResponse:
     changed: (_StunAddress | None) = dataclasses.field(default=None)
 
 
+# =====
+def _parse_address(data: memoryview, trans_id: bytes) -> _StunAddress:
+    if len(data) < 4:
+        raise RuntimeError("Address: data is too short")
+    if data[1] not in [0x01, 0x02]:  # IPv4 or IPv6
+        raise RuntimeError(f"Invalid address family: {data[1]}")
+    (port,) = _PORT.unpack(_trans_xor(data[2:4], trans_id))
+    if data[1] == 0x01:  # IPv4
+        if len(data) < 8:
+            raise RuntimeError("IPv4 address: data is too short")
+        ip = socket.inet_ntop(socket.AF_INET, _trans_xor(data[4:8], trans_id))
+    else:  # IPv6
+        if len(data) < 20:
+            raise RuntimeError("IPv6 address: data is too short")
+        ip = socket.inet_ntop(socket.AF_INET6, _trans_xor(data[4:20], trans_id))
+    return _StunAddress(ip=ip, port=port)
+
+
+def _trans_xor(data: memoryview, trans_id: bytes) -> (bytes | memoryview):
+    if not trans_id:
+        return data
+    # The trans_id already starts with the magic cookie, so it's a complete XOR mask
+    size = len(data)
+    return (int.from_bytes(data, "big") ^ int.from_bytes(trans_id[:size], "big")).to_bytes(size, "big")
+
+
+# =====
+class _StunProtocol(asyncio.DatagramProtocol):
+    def __init__(self) -> None:
+        self.__transport: (asyncio.DatagramTransport | None) = None
+        self.__waiter: (asyncio.Future[bytes] | None) = None
+        self.__trans_id = b""
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.DatagramTransport)
+        self.__transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple) -> None:
+        # The socket lives between the probes, so anything out of a request is just dropped.
+        # The late responses to the previous retries of the same request are fine.
+        if self.__waiter is not None and not self.__waiter.done() and data[4:20] == self.__trans_id:
+            self.__waiter.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        if self.__waiter is not None and not self.__waiter.done():
+            self.__waiter.set_exception(exc)
+
+    async def request(self, msg: bytes, trans_id: bytes, addr: tuple[str, int], timeout: float) -> bytes:
+        assert self.__transport is not None
+        assert self.__waiter is None
+        self.__waiter = asyncio.get_running_loop().create_future()
+        self.__trans_id = trans_id
+        try:
+            self.__transport.sendto(msg, addr)
+            return (await asyncio.wait_for(self.__waiter, timeout=timeout))
+        finally:
+            self.__waiter = None
+            self.__trans_id = b""
+
+
+# =====
+def _has_route(fam: socket.AddressFamily) -> bool:
+    # UDP connect() sends nothing, it just asks the kernel to choose the route
+    probe_ip = ("1.1.1.1" if fam == socket.AF_INET else "2606:4700:4700::1111")
+    try:
+        with socket.socket(fam, socket.SOCK_DGRAM) as sock:
+            sock.connect((probe_ip, 53))
+        return True
+    except OSError:
+        return False
+
+
 # =====
 class Stun:
     def __init__(
@@ -89,17 +176,34 @@ class Stun:
         self.__retries_delay = retries_delay
 
         self.__stun_ip = ""
-        self.__sock: (socket.socket | None) = None
+        self.__stun_addrs: list = []
+        self.__stun_addrs_ts = 0.0
+        self.__transport: (asyncio.DatagramTransport | None) = None
+        self.__proto: (_StunProtocol | None) = None
+        self.__transport_key: tuple = ()
+
+    def invalidate(self) -> None:
+        self.__stun_addrs = []
+        self.__stun_addrs_ts = 0.0
+
+    def close(self) -> None:
+        if self.__transport is not None:
+            self.__transport.close()
+        self.__transport = None
+        self.__proto = None
+        self.__transport_key = ()
 
     async def get_info(self, src_ip: str, src_port: int) -> StunInfo:
         nat_type = StunNatType.ERROR
         ext_ip = ""
         try:
             (src_fam, _, _, _, src_addr) = (await self.__retried_getaddrinfo_udp(src_ip, src_port))[0]
+            if not _has_route(src_fam):
+                raise RuntimeError(f"No route to the internet for {src_fam.name}")
 
             stun_ips = [
                 stun_addr[0]
-                for (stun_fam, _, _, _, stun_addr) in (await self.__retried_getaddrinfo_udp(self.__host, self.__port))
+                for (stun_fam, _, _, _, stun_addr) in (await self.__get_stun_addrs())
                 if stun_fam == src_fam
             ]
             if not stun_ips:
@@ -107,16 +211,13 @@ class Stun:
             if not self.__stun_ip or self.__stun_ip not in stun_ips:
                 self.__stun_ip = stun_ips[0]
 
-            with socket.socket(src_fam, socket.SOCK_DGRAM) as self.__sock:
-                self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                self.__sock.settimeout(self.__timeout)
-                self.__sock.bind(src_addr)
-                (nat_type, resp) = await self.__get_nat_type(src_ip)
-                ext_ip = (resp.ext.ip if resp.ext is not None else "")
+            await self.__ensure_transport(src_fam, src_addr)
+            (nat_type, resp) = await self.__get_nat_type(src_ip)
+            ext_ip = (resp.ext.ip if resp.ext is not None else "")
         except Exception as ex:
             get_logger(0).error("Can't get STUN info: %s", tools.efmt(ex))
-        finally:
-            self.__sock = None
+            self.invalidate()
+            self.close()
 
         return StunInfo(
             nat_type=nat_type,
@@ -127,16 +228,43 @@ class Stun:
             stun_port=self.__port,
         )
 
+    async def __ensure_transport(self, src_fam: socket.AddressFamily, src_addr: tuple) -> None:
+        # The same socket is reused between the probes to keep the NAT mapping stable
+        key = (src_fam, src_addr)
+        if self.__transport is not None and not self.__transport.is_closing() and self.__transport_key == key:
+            return
+        self.close()
+        sock = socket.socket(src_fam, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(src_addr)
+        except Exception:
+            sock.close()
+            raise
+        (self.__transport, self.__proto) = await asyncio.get_running_loop().create_datagram_endpoint(_StunProtocol, sock=sock)
+        self.__transport_key = key
+
+    async def __get_stun_addrs(self) -> list:
+        now = time.monotonic()
+        if not self.__stun_addrs or now - self.__stun_addrs_ts >= 300.0:
+            self.__stun_addrs = await self.__retried_getaddrinfo_udp(self.__host, self.__port)
+            self.__stun_addrs_ts = now
+        return self.__stun_addrs
+
     async def __retried_getaddrinfo_udp(self, host: str, port: int) -> list:
-        retries = self.__retries
+        loop = asyncio.get_running_loop()
+        attempt = 0
         while True:
             try:
-                return socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)
+                return (await asyncio.wait_for(
+                    loop.getaddrinfo(host, port, type=socket.SOCK_DGRAM),
+                    timeout=self.__timeout,
+                ))
             except Exception:
-                retries -= 1
-                if retries == 0:
+                attempt += 1
+                if attempt >= self.__retries:
                     raise
-            await asyncio.sleep(self.__retries_delay)
+            await asyncio.sleep(min(self.__retries_delay * 2 ** (attempt - 1), _MAX_RETRIES_DELAY))
 
     async def __get_nat_type(self, src_ip: str) -> tuple[StunNatType, _StunResponse]:
         first = await self.__make_request("First probe", self.__stun_ip, b"")
@@ -188,59 +316,33 @@ class Stun:
             return _StunResponse(ok=False)
 
         parsed: dict[str, _StunAddress] = {}
+        resp_mv = memoryview(resp)
         offset = 0
-        remaining = len(resp)
-        while remaining > 0:
-            (attr_type, attr_len) = struct.unpack(">HH", resp[offset : offset + 4])  # noqa: E203
-            offset += 4
-            field = {
-                0x0001: "ext",      # MAPPED-ADDRESS
-                0x0020: "ext",      # XOR-MAPPED-ADDRESS
-                0x0004: "src",      # SOURCE-ADDRESS
-                0x0005: "changed",  # CHANGED-ADDRESS
-            }.get(attr_type)
+        while offset < len(resp_mv):
+            (attr_type, attr_len) = _ATTR_HEADER.unpack_from(resp_mv, offset)
+            offset += _ATTR_HEADER.size
+            field = _ATTR_FIELDS.get(attr_type)
             if field is not None:
-                parsed[field] = self.__parse_address(resp[offset:], (trans_id if attr_type == 0x0020 else b""))
+                parsed[field] = _parse_address(
+                    resp_mv[offset : offset + attr_len],  # noqa: E203
+                    (trans_id if attr_type == 0x0020 else b""),
+                )
             offset += attr_len
-            remaining -= (4 + attr_len)
         return _StunResponse(ok=True, **parsed)
 
     async def __inner_make_request(self, trans_id: bytes, req: bytes, addr: tuple[str, int]) -> tuple[bytes, str]:
-        assert self.__sock is not None
+        assert self.__proto is not None
 
-        msg = struct.pack(">HHH", 0x0001, len(req), 0x2112) + trans_id + req
+        msg = _HEADER.pack(0x0001, len(req)) + trans_id + req  # Bind Request
         try:
-            self.__sock.sendto(msg, addr)
-            (data, _) = self.__sock.recvfrom(2048)
+            try:
+                data = await self.__proto.request(msg, trans_id, addr, self.__timeout)
+            except asyncio.TimeoutError:
+                raise RuntimeError("Timed out")
             if len(data) < 20:
                 raise RuntimeError("Response is too short")
             if data[0:2] != b"\x01\x01":
                 raise RuntimeError("Invalid response type")
-            if data[4:20] != trans_id:
-                raise RuntimeError("Transaction ID mismatch")
             return (data[20:], "")
         except Exception as err:
             return (b"", str(err))
-
-    def __parse_address(self, data: bytes, trans_id: bytes) -> _StunAddress:
-        if len(data) < 4:
-            raise RuntimeError("Address: data is too short")
-        if data[1] not in [0x01, 0x02]:  # IPv4 or IPv6
-            raise RuntimeError(f"Invalid address family: {data[1]}")
-        (port,) = struct.unpack(">H", self.__trans_xor(data[2:4], trans_id))
-        if data[1] == 0x01:  # IPv4
-            if len(data) < 8:
-                raise RuntimeError("IPv4 address: data is too short")
-            ip = str(ipaddress.IPv4Address(int.from_bytes(self.__trans_xor(data[4:8], trans_id), "big")))
-        else:  # IPv6
-            if len(data) < 20:
-                raise RuntimeError("IPv6 address: data is too short")
-            ip = str(ipaddress.IPv6Address(int.from_bytes(self.__trans_xor(data[4:20], trans_id), "big")))
-        return _StunAddress(ip=ip, port=port)
-
-    def __trans_xor(self, data: bytes, trans_id: bytes) -> bytes:
-        if not trans_id:
-            return data
-        magic = b"\x21\x12\xA4\x42"
-        xor = (magic + trans_id) * (len(data) // len(magic + trans_id) + 1)
-        return bytes(a ^ b for (a, b) in zip(data, xor[:len(data)])) 
\ No newline at end of file
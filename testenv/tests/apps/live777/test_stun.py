@@ -0,0 +1,121 @@
+# ========================================================================== #
+#                                                                            #
+#    KVMD - The main PiKVM daemon.                                           #
+#                                                                            #
+#    Copyright (C) 2018-2024  Maxim Devaev <mdevaev@gmail.com>               #
+#                                                                            #
+#    This program is free software: you can redistribute it and/or modify    #
+#    it under the terms of the GNU General Public License as published by    #
+#    the Free Software Foundation, either version 3 of the License, or       #
+#    (at your option) any later version.                                     #
+#                                                                            #
+#    This program is distributed in the hope that it will be useful,         #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#    GNU General Public License for more details.                            #
+#                                                                            #
+#    You should have received a copy of the GNU General Public License       #
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                            #
+# ========================================================================== #
+
+
+import asyncio
+import socket
+import struct
+import secrets
+
+import pytest
+
+from kvmd.apps.live777.stun import StunNatType
+from kvmd.apps.live777.stun import Stun
+from kvmd.apps.live777.stun import _parse_address
+
+
+# =====
+_MAGIC = b"\x21\x12\xA4\x42"
+
+
+def _make_address_value(ip: str, port: int, trans_id: bytes) -> bytes:
+    (fam, code) = ((socket.AF_INET6, 0x02) if ":" in ip else (socket.AF_INET, 0x01))
+    raw = socket.inet_pton(fam, ip)
+    if trans_id:
+        raw = bytes(a ^ b for (a, b) in zip(raw, trans_id))
+        port ^= 0x2112
+    return struct.pack(">BBH", 0, code, port) + raw
+
+
+def _make_xor_mapped_attr(ip: str, port: int, trans_id: bytes) -> bytes:
+    value = _make_address_value(ip, port, trans_id)
+    return struct.pack(">HH", 0x0020, len(value)) + value
+
+
+class _FakeStunServer(asyncio.DatagramProtocol):
+    def __init__(self, mapped_ip: str, mapped_port: int) -> None:
+        self.requests: list[bytes] = []
+        self.__mapped_ip = mapped_ip
+        self.__mapped_port = mapped_port
+        self.__transport: (asyncio.DatagramTransport | None) = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.DatagramTransport)
+        self.__transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple) -> None:
+        assert self.__transport is not None
+        self.requests.append(data)
+        trans_id = data[4:20]
+        attr = _make_xor_mapped_attr(self.__mapped_ip, self.__mapped_port, trans_id)
+        self.__transport.sendto(struct.pack(">HH", 0x0101, len(attr)) + trans_id + attr, addr)
+
+
+# =====
+@pytest.mark.parametrize("ip, port, xor", [
+    ("203.0.113.5",         40000, True),
+    ("2001:db8::1234:5678", 5555,  True),
+    ("198.51.100.7",        3478,  False),
+    ("2001:db8:ffff::1",    65535, False),
+])
+def test_ok__parse_address(ip: str, port: int, xor: bool) -> None:
+    trans_id = (_MAGIC + secrets.token_bytes(12) if xor else b"")
+    addr = _parse_address(memoryview(_make_address_value(ip, port, trans_id)), trans_id)
+    assert addr.ip == ip
+    assert addr.port == port
+
+
+@pytest.mark.parametrize("data", [
+    b"\x00\x01\x00",
+    b"\x00\x03\x00\x00\x00\x00\x00\x00",
+    b"\x00\x01\x00\x00\x00\x00\x00",
+    b"\x00\x02\x00\x00" + b"\x00" * 15,
+])
+def test_fail__parse_address(data: bytes) -> None:
+    with pytest.raises(RuntimeError):
+        _parse_address(memoryview(data), b"")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mapped_ip", ["203.0.113.5", "2001:db8::1234:5678"])
+async def test_ok__get_info(mapped_ip: str) -> None:
+    server = _FakeStunServer(mapped_ip, 40000)
+    (transport, _) = await asyncio.get_running_loop().create_datagram_endpoint(
+        (lambda: server),
+        local_addr=("127.0.0.1", 0),
+    )
+    stun = Stun("127.0.0.1", transport.get_extra_info("sockname")[1], 1.0, 1, 0.1)
+    try:
+        info = await stun.get_info("127.0.0.1", 0)
+    finally:
+        stun.close()
+        transport.close()
+
+    assert info.nat_type == StunNatType.FULL_CONE_NAT
+    assert info.ext_ip == mapped_ip
+
+    assert len(server.requests) == 2  # First probe and Change-Request
+    assert len(server.requests[0]) == 20
+    for req in server.requests:
+        (req_type, req_len) = struct.unpack(">HH", req[:4])
+        assert req_type == 0x0001
+        assert len(req) == 20 + req_len
+        assert req[4:8] == _MAGIC